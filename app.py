@@ -1,15 +1,22 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-import gspread
-from google.oauth2.service_account import Credentials
 import os
 import json
+import logging
+import tempfile
+import time
+import warnings
+from urllib.parse import quote
 
 from streamlit_autorefresh import st_autorefresh
 
+logger = logging.getLogger("health_tracker")
+
 # -----------------------
 # CONFIG (yours)
 # -----------------------
@@ -17,53 +24,203 @@ SECRET_FILE_PATH = "/etc/secrets/gcp-key.pem"
 SHEET_KEY = "1qc_8gnDFMkwnT3j2i_BFBWFqsLymroqVf-rrQuGzzOc"
 WORKSHEET_NAME = "daily_manual_entry"
 
-SCOPES = [
+SCOPES = (
     "https://www.googleapis.com/auth/spreadsheets",
     "https://www.googleapis.com/auth/drive",
-]
+)
 
 EXPECTED_COLUMNS = ["date", "ahi", "leak", "coherence", "energy", "notes"]
+NUMERIC_COLUMNS = ["ahi", "leak", "coherence", "energy"]
+
+# Arrow-backed dtypes of every loaded frame, so st.dataframe can ship it without a
+# pandas->Arrow conversion (metrics stay double: float32 would show 3.1 as 3.0999999)
+FRAME_DTYPES = {
+    "date": pd.ArrowDtype(pa.timestamp("ns")),
+    **{c: pd.ArrowDtype(pa.float64()) for c in NUMERIC_COLUMNS},
+    "notes": pd.ArrowDtype(pa.string()),
+    "date_str": pd.ArrowDtype(pa.string()),
+}
+
+# Returned (as a copy) for empty / header-only sheets
+_EMPTY_DF = pd.DataFrame({c: pd.Series(dtype=dtype) for c, dtype in FRAME_DTYPES.items()})
+
+# Bounded A1 ranges: header row (A..F) + data rows (A..last needed column),
+# fetched together in one batchGet
+HEADER_RANGE = f"{WORKSHEET_NAME}!A1:F1"
+
+# Numbers and dates come back typed: dates as Sheets serial numbers (days since 1899-12-30).
+# Column-major, so each sheet column arrives as one list that becomes a DataFrame column as-is.
+VALUE_PARAMS = {
+    "majorDimension": "COLUMNS",
+    "valueRenderOption": "UNFORMATTED_VALUE",
+    "dateTimeRenderOption": "SERIAL_NUMBER",
+}
+SHEETS_EPOCH = "1899-12-30"
+# Serials outside this range don't fit timestamp[ns] (e.g. 20240105 typed without dashes is
+# stored as a number), so they are parsed as text instead
+_NS_PER_DAY = 86_400 * 10**9
+_SERIAL_RANGE = (
+    -((pd.Timestamp(SHEETS_EPOCH).value - pd.Timestamp.min.value) // _NS_PER_DAY),
+    (pd.Timestamp.max.value - pd.Timestamp(SHEETS_EPOCH).value) // _NS_PER_DAY,
+)
+
+SHEETS_API_URL = f"https://sheets.googleapis.com/v4/spreadsheets/{SHEET_KEY}"
+DRIVE_FILE_URL = f"https://www.googleapis.com/drive/v3/files/{SHEET_KEY}"
+REQUEST_TIMEOUT_SECONDS = 30
 
 # ✅ True auto refresh interval
 AUTO_REFRESH_SECONDS = 10  # change to 5, 15, 30, etc.
 
+# Each tick re-reads the last N loaded rows along with any new ones, so rows that were still
+# being typed (or were just corrected / cleared) get replaced
+TAIL_OVERLAP_ROWS = 5
+# Re-read the whole sheet every N refresh ticks: picks up header changes, edits above the
+# overlap, and deleted rows
+FULL_RELOAD_TICKS = 30
+
+# Each session keeps only the newest N rows in memory (Streamlit holds session state per user
+# in the server process); the sheet itself is still read incrementally in full. Averages,
+# correlations and charts cover this window, and at this size the trend chart needs no
+# downsampling.
+SESSION_MAX_ROWS = 365
+
+# Local mirror of the last-good DataFrame so worker restarts don't need a full Sheets download
+# (the incremental-read cursor rides along in the Parquet schema metadata under this key)
+DISK_CACHE_PATH = "/tmp/health_cache.parquet"
+DISK_CACHE_META_KEY = b"health_tracker"
+
+# Optional push mode: webhook.py touches this file whenever the sheet is edited.
+# While it exists, reruns only hit Sheets after its mtime changes (with a full re-read, since
+# an edit can be anywhere), plus a full re-read every PUSH_FALLBACK_SECONDS in case the
+# webhook died and left a stale flag behind.
+DIRTY_FLAG_PATH = "/tmp/dirty.flag"
+WEBHOOK_REFRESH_SECONDS = 30
+PUSH_FALLBACK_SECONDS = 300
+
 st.set_page_config(page_title="Health Tracker", page_icon="💪", layout="wide")
 
+
+def _dirty_flag_mtime():
+    try:
+        return os.path.getmtime(DIRTY_FLAG_PATH)
+    except OSError:
+        return None
+
+
+dirty_mtime = _dirty_flag_mtime()
+refresh_seconds = AUTO_REFRESH_SECONDS if dirty_mtime is None else WEBHOOK_REFRESH_SECONDS
+
 # ✅ This forces Streamlit to rerun automatically every N seconds
-st_autorefresh(interval=AUTO_REFRESH_SECONDS * 1000, key="app_autorefresh")
+st_autorefresh(interval=refresh_seconds * 1000, key="app_autorefresh")
 
 
 # -----------------------
 # GOOGLE CONNECTOR
 # -----------------------
-@st.cache_resource
-def get_worksheet():
-    """Connect to Google Sheets using service-account JSON stored in Render Secret File."""
+def _credentials_mtime():
+    """mtime of whichever credentials file is in use; keys the caches below."""
+    for path in (SECRET_FILE_PATH, "credentials.json"):
+        if os.path.exists(path):
+            return os.path.getmtime(path)
+    return None
+
+
+def _fix_private_key(info: dict) -> dict:
+    pk = info.get("private_key", "")
+    if isinstance(pk, str) and "\\n" in pk:
+        # Convert literal "\n" to real newlines
+        info["private_key"] = pk.replace("\\n", "\n")
+    return info
+
+
+def _service_account_info():
+    """Service-account info dict from the first configured source, or None.
+
+    Order: Render secret file -> GCP_SERVICE_ACCOUNT_JSON env var -> individual GCP_* env
+    vars -> st.secrets["gcp_service_account"].
+    """
     if os.path.exists(SECRET_FILE_PATH):
-        with open(SECRET_FILE_PATH, "r") as f:
-            raw = f.read().strip()
+        with open(SECRET_FILE_PATH, "rb") as f:
+            return json.loads(f.read())
+
+    if os.environ.get("GCP_SERVICE_ACCOUNT_JSON"):
+        return json.loads(os.environ["GCP_SERVICE_ACCOUNT_JSON"])
+
+    if os.environ.get("GCP_PRIVATE_KEY") and os.environ.get("GCP_CLIENT_EMAIL"):
+        return {
+            "type": "service_account",
+            "project_id": os.environ.get("GCP_PROJECT_ID", ""),
+            "private_key_id": os.environ.get("GCP_PRIVATE_KEY_ID", ""),
+            "private_key": os.environ["GCP_PRIVATE_KEY"],
+            "client_email": os.environ["GCP_CLIENT_EMAIL"],
+            "client_id": os.environ.get("GCP_CLIENT_ID", ""),
+            "token_uri": os.environ.get("GCP_TOKEN_URI", "https://oauth2.googleapis.com/token"),
+        }
+
+    try:
+        if "gcp_service_account" in st.secrets:
+            return dict(st.secrets["gcp_service_account"])
+    except Exception:
+        # No secrets.toml configured
+        pass
 
-        creds = json.loads(raw)
+    return None
 
-        pk = creds.get("private_key", "")
-        if isinstance(pk, str):
-            # Convert literal "\n" to real newlines (works whether needed or not)
-            creds["private_key"] = pk.replace("\\n", "\n")
 
-        credentials = Credentials.from_service_account_info(creds, scopes=SCOPES)
+# Credentials get their own process-wide cache so the PEM decode / RSA key build happens once,
+# independently of the HTTP session (st.cache_resource is shared across sessions and reruns).
+# Keyed on the file mtime so a rotated secret is picked up without a restart.
+@st.cache_resource(max_entries=1)
+def get_credentials(source_mtime=None):
+    """Load service-account credentials (see _service_account_info), else local credentials.json."""
+    # Imported lazily: google-auth is only needed once we actually connect
+    from google.oauth2.service_account import Credentials
 
-    elif os.path.exists("credentials.json"):
-        credentials = Credentials.from_service_account_file("credentials.json", scopes=SCOPES)
+    info = _service_account_info()
+    if info is not None:
+        return Credentials.from_service_account_info(_fix_private_key(info), scopes=SCOPES)
 
-    else:
-        raise FileNotFoundError(
-            f"Credentials not found. Expected Render secret file at {SECRET_FILE_PATH} "
-            f"or local credentials.json."
-        )
+    if os.path.exists("credentials.json"):
+        return Credentials.from_service_account_file("credentials.json", scopes=SCOPES)
+
+    raise FileNotFoundError(
+        f"Credentials not found. Expected Render secret file at {SECRET_FILE_PATH}, "
+        f"GCP_SERVICE_ACCOUNT_JSON / GCP_* env vars, st.secrets['gcp_service_account'], "
+        f"or local credentials.json."
+    )
+
+
+def get_session():
+    """Authorized HTTP session for the Sheets/Drive REST APIs (cached service-account creds)."""
+    return _connect(_credentials_mtime())
+
+
+# One AuthorizedSession per process, reused across reruns and sessions, talking to the REST
+# endpoints directly: no gspread client, and no open_by_key()/worksheet() metadata round-trips.
+@st.cache_resource(max_entries=1)
+def _connect(creds_mtime):
+    import requests
+    import urllib3
+    from google.auth.transport.requests import AuthorizedSession
 
-    client = gspread.authorize(credentials)
-    sheet = client.open_by_key(SHEET_KEY)
-    return sheet.worksheet(WORKSHEET_NAME)
+    session = AuthorizedSession(get_credentials(creds_mtime))
+
+    # Bigger keep-alive pool + retry on transient errors, shared by concurrent refreshes
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=20,
+        pool_maxsize=20,
+        max_retries=urllib3.Retry(
+            total=3, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504]
+        ),
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+def _api_get(session, url: str, params=None) -> dict:
+    resp = session.get(url, params=params, timeout=REQUEST_TIMEOUT_SECONDS)
+    resp.raise_for_status()
+    return resp.json()
 
 
 # -----------------------
@@ -74,8 +231,26 @@ def _clean_header(h: str) -> str:
     return str(h).replace("\ufeff", "").strip().lower()
 
 
+# Accept common alternatives for date
+_HEADER_ALIASES = {
+    "day": "date",
+    "datetime": "date",
+    "timestamp": "date",
+    "recorded_at": "date",
+}
+
+
+# The header row is stable across refresh ticks, so memoize on the raw tuple.
+# (st.cache_resource rather than functools.lru_cache: Streamlit re-executes this script,
+# and a plain lru_cache would be rebuilt on every rerun.)
+@st.cache_resource(max_entries=8)
+def _normalize_headers_cached(raw: tuple) -> tuple:
+    cleaned = (_clean_header(h) for h in raw)
+    return tuple(_HEADER_ALIASES.get(h, h) for h in cleaned)
+
+
 def _normalize_headers(headers):
-    return [_clean_header(h) for h in headers]
+    return list(_normalize_headers_cached(tuple(headers)))
 
 
 def _ensure_expected_cols(df: pd.DataFrame) -> pd.DataFrame:
@@ -88,29 +263,70 @@ def _ensure_expected_cols(df: pd.DataFrame) -> pd.DataFrame:
 # -----------------------
 # DATA FUNCTIONS
 # -----------------------
-def load_data_live() -> pd.DataFrame:
-    ws = get_worksheet()
-    data = ws.get_all_values()
+def _rows_range(first_row: int, last_col: str) -> str:
+    return f"{WORKSHEET_NAME}!A{first_row}:{last_col}"
 
-    if not data:
-        return pd.DataFrame(columns=EXPECTED_COLUMNS)
 
-    raw_headers = data[0]
-    headers = _normalize_headers(raw_headers)
+def load_data_via_batch_get(session, last_col: str = "F"):
+    """Fetch header + rows in a single values.batchGet round-trip (numbers come back as numbers).
+
+    Returns (headers, columns). Only columns A..last_col are read; the rest are padded as blanks.
+    """
+    resp = _api_get(
+        session,
+        f"{SHEETS_API_URL}/values:batchGet",
+        params={"ranges": [HEADER_RANGE, _rows_range(2, last_col)], **VALUE_PARAMS},
+    )
+
+    header_range, rows_range = resp["valueRanges"]
+    # Column-major: row 1 comes back as one single-cell list per column ([] for a blank cell)
+    headers = [col[0] if col else "" for col in header_range.get("values", [])]
+    if not headers:
+        return [], []
+
+    return headers, _pad_columns(rows_range.get("values", []), len(headers))
+
 
-    if len(data) == 1:
-        df = pd.DataFrame(columns=headers)
-        return _ensure_expected_cols(df)
+def _values_get(session, a1_range: str) -> dict:
+    return _api_get(session, f"{SHEETS_API_URL}/values/{quote(a1_range, safe='')}", VALUE_PARAMS)
 
-    df = pd.DataFrame(data[1:], columns=headers)
 
-    # Accept common alternatives for date
-    df.rename(columns={
-        "day": "date",
-        "datetime": "date",
-        "timestamp": "date",
-        "recorded_at": "date",
-    }, inplace=True)
+def load_rows_from(session, first_row: int, width: int, last_col: str = "F"):
+    """Fetch sheet rows first_row.. (to the last non-empty one), as columns."""
+    resp = _values_get(session, _rows_range(first_row, last_col))
+    return _pad_columns(resp.get("values", []), width)
+
+
+def _pad_columns(columns, width: int):
+    # The API drops trailing empty cells (and trailing empty columns), so pad every column to
+    # the longest one and add blank columns up to the header width
+    n_rows = max(map(len, columns), default=0)
+    padded = [col + [""] * (n_rows - len(col)) for col in columns]
+    return padded + [[""] * n_rows for _ in range(width - len(padded))]
+
+
+def _row_count(columns) -> int:
+    return len(columns[0]) if columns else 0
+
+
+def build_dataframe(raw_headers, columns, first_row: int = 2) -> pd.DataFrame:
+    """Typed frame from column-major sheet values, indexed by sheet row number."""
+    # Empty sheet or header row only: skip the rename/ensure/sort pipeline entirely
+    if _row_count(columns) == 0:
+        return _EMPTY_DF.copy()
+
+    headers = _normalize_headers(raw_headers)
+
+    # The API already hands over one list per column, so pandas builds each column directly.
+    # Blank numeric cells become None, letting all-numeric columns land as float64 without
+    # a to_numeric pass.
+    data = {}
+    for h, values in zip(headers, columns):
+        if h in NUMERIC_COLUMNS:
+            values = [None if v == "" else v for v in values]
+        data[h] = values
+    # Index = sheet row, so a re-read of the tail can replace exactly the rows it covers
+    df = pd.DataFrame(data, index=pd.RangeIndex(first_row, first_row + _row_count(columns)))
 
     if "date" not in df.columns:
         raise KeyError(
@@ -120,117 +336,563 @@ def load_data_live() -> pd.DataFrame:
             f"Fix Row 1 to exactly: {', '.join(EXPECTED_COLUMNS)}"
         )
 
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-
-    for col in ["ahi", "leak", "coherence", "energy"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["date"] = _parse_dates(df["date"])
+
+    # UNFORMATTED_VALUE already returns numbers; only columns with text mixed in (numbers typed
+    # as text, "n/a", ...) need converting. Do those as one block, and fall back to per-column
+    # coercion only if some cell isn't parseable.
+    text_cols = [
+        c for c in NUMERIC_COLUMNS if c in df.columns and not pd.api.types.is_numeric_dtype(df[c])
+    ]
+    if text_cols:
+        # Blank cells are already None here, which astype(np.float64) maps to NaN
+        try:
+            df[text_cols] = df[text_cols].to_numpy(dtype=object).astype(np.float64)
+        except (TypeError, ValueError):
+            for col in text_cols:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
 
     df = _ensure_expected_cols(df)
-    df = df.sort_values("date", ascending=False)
+    # Pre-format once at load so the raw table doesn't copy + strftime the frame on every rerun
+    df["date_str"] = df["date"].dt.strftime("%Y-%m-%d")
+    # Notes can hold numbers under UNFORMATTED_VALUE; stringify (keeping blanks as NA) first
+    df["notes"] = df["notes"].astype("string")
+    # Fixed Arrow dtypes (not inferred) so incremental appends and _EMPTY_DF always line up
+    df = df.astype(FRAME_DTYPES)
+    # Single ascending sort; newest-first views use df.iloc[::-1] instead of re-sorting
+    return _sort_by_date(df)
+
+
+def _sort_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    """Stable ascending sort on date, skipped when the sheet is already in date order.
+
+    Rows are normally appended chronologically, so the O(N) monotonicity check usually
+    saves the O(N log N) sort (and its copy of the frame). Undated rows (blank / unparseable
+    date) go first: they are the first to leave the session window and never count as the
+    latest entry.
+    """
+    if df["date"].is_monotonic_increasing:  # False whenever there's a NaT
+        return df
+    return df.sort_values("date", ascending=True, kind="stable", na_position="first")
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    """Date cells arrive as serial numbers; anything else is parsed as text (NaT if it can't be)."""
+    serial = pd.to_numeric(values, errors="coerce")
+    serial = serial.where(serial.between(*_SERIAL_RANGE))
+    dates = pd.to_datetime(serial, unit="D", origin=SHEETS_EPOCH)
+
+    is_text = serial.isna()
+    if is_text.any():
+        text = values[is_text].astype(str).str.strip().str.removesuffix(".0")
+        # Fixed-format fast path; cache dedupes repeated dates
+        parsed = pd.to_datetime(
+            text, format="%Y-%m-%d", exact=True, errors="coerce", cache=True, utc=False
+        )
+        rest = parsed.isna()
+        if rest.any():
+            # Other layouts (2024/01/05, 20240105, ...), element by element. A trailing UTC
+            # offset is dropped so timestamps keep the wall-clock date they were typed with;
+            # utc=True keeps any other tz-aware leftovers from mixing offsets (which raises)
+            # and they come back as naive UTC.
+            local = text[rest].str.replace(r"(?:Z|[+-]\d{2}:?\d{2})$", "", regex=True)
+            parsed[rest] = pd.to_datetime(
+                local, format="mixed", errors="coerce", utc=True
+            ).dt.tz_localize(None)
+        dates = dates.fillna(parsed)
+    # A bad date cell must not fail the whole load (and stall the incremental cursor)
+    return dates.where(dates.between(pd.Timestamp.min, pd.Timestamp.max))
+
+
+def fetch_updates(session, last_row, raw_headers, last_col: str):
+    """Network-only part of a refresh tick; touches no Streamlit state so it can run off-thread.
+
+    Returns ("full", (headers, columns), last_col) for a full reload (last_row None) or
+    ("rows", (first_row, columns), last_col) for the re-read tail of the sheet.
+    """
+    if last_row is None or not raw_headers:
+        # First load / empty sheet so far / periodic full reload
+        return "full", load_data_via_batch_get(session, last_col), last_col
+
+    # The tail read doubles as the freshness probe: it covers the last TAIL_OVERLAP_ROWS loaded
+    # rows plus anything appended, and apply_updates() compares it with what's loaded
+    first_row = max(2, last_row - TAIL_OVERLAP_ROWS + 1)
+    columns = load_rows_from(session, first_row, len(raw_headers), last_col)
+    return "rows", (first_row, columns), last_col
+
+
+def apply_updates(result):
+    """Fold a fetch_updates() result into session state. Returns (df, changed)."""
+    kind, payload, last_col = result
+
+    if kind == "full":
+        headers, columns = payload
+        df, _ = _trim_to_window(build_dataframe(headers, columns))
+        st.session_state.raw_headers = headers
+        # Header row + data rows; 0 while even row 1 is blank
+        st.session_state.last_row = 1 + _row_count(columns) if headers else 0
+        st.session_state.loaded_last_col = last_col
+        st.session_state.refresh_ticks = 0
+        st.session_state.corr_state = correlation_moments(df)
+        st.session_state.nums = metric_block(df)
+        changed = not df.equals(st.session_state.df)
+    else:
+        first_row, columns = payload
+        base = st.session_state.df
+        tail_df = build_dataframe(st.session_state.raw_headers, columns, first_row)
+        # Rows cleared at the end of the sheet move the cursor back
+        st.session_state.last_row = first_row - 1 + _row_count(columns)
+
+        # Swap the re-read rows (matched by sheet row) for their fresh values
+        replaced = base[base.index >= first_row]
+        df = pd.concat([base[base.index < first_row], tail_df])
+        df, evicted = _trim_to_window(_sort_by_date(df))
+        if df.equals(base):
+            return base, False
+
+        # Only the replaced, re-read and evicted rows' moments change: O(tail), not O(N)
+        corr_state = subtract_moments(st.session_state.corr_state, correlation_moments(replaced))
+        corr_state = merge_moments(corr_state, correlation_moments(tail_df))
+        if len(evicted):
+            corr_state = subtract_moments(corr_state, correlation_moments(evicted))
+        st.session_state.corr_state = corr_state
+        st.session_state.nums = metric_block(df)
+        changed = True
+
+    if changed:
+        save_disk_cache(df)
+    return df, changed
+
+
+def _trim_to_window(df: pd.DataFrame):
+    """Split df (sorted by date) into the newest SESSION_MAX_ROWS rows and the rest."""
+    if len(df) <= SESSION_MAX_ROWS:
+        return df, df.iloc[:0]
+    return df.iloc[-SESSION_MAX_ROWS:], df.iloc[:-SESSION_MAX_ROWS]
+
+
+def save_disk_cache(df: pd.DataFrame):
+    """Mirror df + the incremental-read cursor to /tmp (atomic replace, best effort).
+
+    The cursor is stored in the file's own schema metadata and each write goes through a
+    unique temp file, so concurrent sessions can never pair one frame with another's cursor.
+    """
+    meta = {
+        "last_row": st.session_state.last_row,
+        "raw_headers": st.session_state.raw_headers,
+        "last_col": st.session_state.loaded_last_col,
+        "version": st.session_state.get("sheet_version"),
+    }
+    tmp_path = None
+    try:
+        # Keep the index: it maps each row back to its sheet row for tail re-reads
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), DISK_CACHE_META_KEY: json.dumps(meta)}
+        )
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(DISK_CACHE_PATH), suffix=".tmp")
+        os.close(fd)
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, DISK_CACHE_PATH)
+    except Exception:
+        # The disk cache is only an optimization; never fail a refresh over it
+        logger.exception("Could not write disk cache %s", DISK_CACHE_PATH)
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_disk_cache():
+    """Read the mirrored df and its cursor. Returns (df, meta), or None.
+
+    Touches no session state; see _restore_disk_state().
+    """
+    if not os.path.exists(DISK_CACHE_PATH):
+        return None
+    try:
+        table = pq.read_table(DISK_CACHE_PATH)
+        meta = json.loads(table.schema.metadata[DISK_CACHE_META_KEY])
+        df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        df.index = df.index.astype("int64")
+        # Caches from older builds may carry inferred dtypes or more than the session window
+        df, _ = _trim_to_window(df.astype(FRAME_DTYPES))
+    except Exception:
+        logger.exception("Ignoring unreadable disk cache %s", DISK_CACHE_PATH)
+        return None
+    return df, meta
+
+
+def _restore_disk_state(df: pd.DataFrame, meta: dict):
+    """Make a load_disk_cache() result the session's last-good df and read cursor."""
+    st.session_state.df = df
+    st.session_state.raw_headers = meta["raw_headers"]
+    st.session_state.last_row = meta["last_row"]
+    st.session_state.loaded_last_col = meta.get("last_col", "F")
+    st.session_state.refresh_ticks = 0
+    st.session_state.sheet_version = meta.get("version")
+    st.session_state.corr_state = correlation_moments(df)
+    st.session_state.nums = metric_block(df)
+
+
+def load_sheet_version(session) -> int:
+    """Drive revision counter for the spreadsheet; it bumps on every edit (tiny metadata GET)."""
+    resp = _api_get(session, DRIVE_FILE_URL, params={"fields": "version"})
+    return int(resp["version"])
+
+
+def _last_column_for(columns, raw_headers) -> str:
+    """Right-most sheet column (A..F) needed to cover `columns`, from the known header row.
+
+    Before the header is known, assume row 1 is laid out as EXPECTED_COLUMNS; a wrong guess
+    is corrected on the next tick once the real header has been read.
+    """
+    headers = _normalize_headers(raw_headers) if raw_headers else EXPECTED_COLUMNS
+    positions = [headers.index(c) for c in columns if c in headers]
+    if len(positions) < len(columns):
+        return "F"
+    return chr(ord("A") + min(max(positions), 5))
+
+
+def projection_widens(columns) -> bool:
+    """True if `columns` reach past what the cached frame holds (needs a full reload)."""
+    if "last_row" not in st.session_state:
+        return False
+    return _widens(columns, st.session_state.raw_headers, st.session_state.loaded_last_col)
+
+
+def _widens(columns, raw_headers, loaded_last_col: str) -> bool:
+    return _last_column_for(columns, raw_headers) > loaded_last_col
+
+
+def _fetch_args(columns, full: bool = False):
+    session = get_session()
+    raw_headers = st.session_state.get("raw_headers", [])
+
+    # The cached frame only holds columns up to loaded_last_col; widening the projection
+    # (e.g. opening the raw table) needs a full reload, narrowing it keeps the cache until the
+    # next full reload, which re-projects to what the active view needs.
+    if "last_row" not in st.session_state or projection_widens(columns):
+        return session, None, [], _last_column_for(columns, raw_headers)
+
+    st.session_state.refresh_ticks += 1
+    if full or st.session_state.refresh_ticks % FULL_RELOAD_TICKS == 0:
+        return session, None, [], _last_column_for(columns, raw_headers)
+    return session, st.session_state.last_row, raw_headers, st.session_state.loaded_last_col
+
+
+def refresh_data(columns) -> pd.DataFrame:
+    """Incremental refresh: after the first full load, only the sheet's tail is re-read.
+
+    Appended rows and edits within the last TAIL_OVERLAP_ROWS rows show up on the next tick;
+    edits further up, deletions and header changes on the next full reload (every
+    FULL_RELOAD_TICKS ticks).
+    On a cold start the Parquet mirror is loaded first: if the spreadsheet's Drive revision
+    still matches the one it was saved at, it is used as-is; if the revision moved, the sheet
+    is fully reloaded (an in-place edit appends nothing); if the probe failed, the mirror's
+    tail is re-read.
+    """
+    saved_version = None
+    if "last_row" not in st.session_state:
+        cached = load_disk_cache()
+        if cached is not None:
+            cached_df, meta = cached
+            widens = _widens(columns, meta["raw_headers"], meta.get("last_col", "F"))
+            fresh = time.time() - os.path.getmtime(DISK_CACHE_PATH) < AUTO_REFRESH_SECONDS
+            if fresh and not widens:
+                _restore_disk_state(cached_df, meta)
+                return cached_df
+
+        # Probe the revision *before* reading values, so the saved version never runs ahead
+        # of the saved rows
+        session = get_session()
+        try:
+            version = load_sheet_version(session)
+        except Exception:
+            # Drive metadata is only a shortcut; fall back to reading values
+            logger.exception("Drive revision probe failed")
+            version = None
+
+        # Only now, past the slow connect + probe, does the restored cursor go live: a run
+        # interrupted earlier leaves the session on the cold path instead of half-restored
+        if cached is not None:
+            saved_version = meta.get("version")
+            if version is None or version == saved_version:
+                _restore_disk_state(cached_df, meta)
+                if version is not None and not widens:
+                    return cached_df
+            else:
+                # No cursor: _fetch_args() asks for a full reload, compared against the mirror
+                st.session_state.df = cached_df
+        st.session_state.sheet_version = version
+
+    df, changed = apply_updates(fetch_updates(*_fetch_args(columns)))
+    if not changed and st.session_state.sheet_version != saved_version:
+        # Same rows at a newer revision (e.g. an edit that was undone): record the revision so
+        # the next cold start can take the shortcut again
+        save_disk_cache(df)
     return df
 
 
-# ✅ Cache the sheet read for exactly the refresh interval
-@st.cache_data(ttl=AUTO_REFRESH_SECONDS)
-def load_data_cached() -> pd.DataFrame:
-    return load_data_live()
+@st.cache_resource
+def get_fetch_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="sheets-fetch")
+
+
+def start_background_refresh(columns, full: bool = False) -> Future:
+    """Kick off this tick's Sheets fetch so the page renders from cached data meanwhile."""
+    return get_fetch_executor().submit(fetch_updates, *_fetch_args(columns, full))
+
+
+def metric_block(df: pd.DataFrame) -> np.ndarray:
+    """The four metric columns as one contiguous (rows, 4) float32 array, NaN for blanks.
+
+    Built once per data change and kept in session state, so reruns don't re-convert
+    the Arrow-backed columns just to compute the dashboard numbers.
+    """
+    return np.ascontiguousarray(df[NUMERIC_COLUMNS].to_numpy(dtype=np.float32, na_value=np.nan))
 
 
-def calculate_correlations(df: pd.DataFrame):
-    if df is None or df.empty or len(df) < 7:
+def correlation_moments(df: pd.DataFrame) -> dict:
+    """Running sums over complete metric rows: count, per-column sum, and X^T X."""
+    # float64 accumulators: float32 sums-of-squares lose too much precision as n grows
+    arr = df[NUMERIC_COLUMNS].dropna().to_numpy(dtype=np.float64)
+    return {"n": len(arr), "sum": arr.sum(axis=0), "sumsq": arr.T @ arr}
+
+
+def merge_moments(a: dict, b: dict) -> dict:
+    return {"n": a["n"] + b["n"], "sum": a["sum"] + b["sum"], "sumsq": a["sumsq"] + b["sumsq"]}
+
+
+def subtract_moments(a: dict, b: dict) -> dict:
+    """Remove rows (summarised by b) that slid out of the session window from a."""
+    return {"n": a["n"] - b["n"], "sum": a["sum"] - b["sum"], "sumsq": a["sumsq"] - b["sumsq"]}
+
+
+def calculate_correlations(df: pd.DataFrame, moments: dict):
+    """Pearson correlations of the metric columns from running moments (no pass over df)."""
+    if df is None or df.empty or len(df) < 7 or moments is None:
         return None
-    cols = ["ahi", "leak", "coherence", "energy"]
-    if not all(c in df.columns for c in cols):
+    n = moments["n"]
+    if n < 2:
         return None
-    return df[cols].corr()
+    cov = (moments["sumsq"] - np.outer(moments["sum"], moments["sum"]) / n) / (n - 1)
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.outer(std, std)
+    return pd.DataFrame(corr, index=NUMERIC_COLUMNS, columns=NUMERIC_COLUMNS)
+
+
+# Show the numeric value table next to the heatmap only up to this many metrics
+CORR_LABEL_MAX_SIZE = 8
+
+# RdBu-style diverging colormap endpoints (RGB): -1 -> red, 0 -> near-white, +1 -> blue
+_CORR_NEG = np.array([178, 24, 43], dtype=np.float32)
+_CORR_MID = np.array([247, 247, 247], dtype=np.float32)
+_CORR_POS = np.array([33, 102, 172], dtype=np.float32)
+
+
+# Every data change yields a new matrix (~200 KB image each); keep only the recent few
+@st.cache_data(max_entries=4)
+def correlation_image(corr_bytes: bytes, size: int, cell_px: int = 64) -> np.ndarray:
+    """Render a correlation matrix as an RGB image (cached on the matrix bytes)."""
+    values = np.frombuffer(corr_bytes, dtype=np.float32).reshape(size, size)
+    t = np.clip(np.nan_to_num(values), -1.0, 1.0)[..., None]
+    rgb = np.where(t < 0, _CORR_MID + (_CORR_NEG - _CORR_MID) * -t, _CORR_MID + (_CORR_POS - _CORR_MID) * t)
+    # Upscale each cell to a cell_px x cell_px block
+    return np.kron(rgb, np.ones((cell_px, cell_px, 1), dtype=np.float32)).astype(np.uint8)
 
 
 # -----------------------
 # UI
 # -----------------------
 st.title("💪 Personal Health Tracker")
-st.caption(f"Auto-refreshing every {AUTO_REFRESH_SECONDS} seconds from Google Sheets.")
-
-tab1, tab2, tab3, tab4 = st.tabs(["📊 Dashboard", "🔍 Correlations", "⚙️ Setup", "🧾 Raw Table"])
+if dirty_mtime is None:
+    st.caption(f"Auto-refreshing every {refresh_seconds} seconds from Google Sheets.")
+else:
+    st.caption(
+        f"Updating on sheet edits (checked every {refresh_seconds} seconds, "
+        f"full re-read at least every {PUSH_FALLBACK_SECONDS // 60} minutes)."
+    )
+
+TAB_DASHBOARD = "📊 Dashboard"
+TAB_CORRELATIONS = "🔍 Correlations"
+TAB_RAW = "🧾 Raw Table"
+TAB_SETUP = "⚙️ Setup"
+
+# Sheet columns each view needs; everything but the raw table can skip the free-text notes
+VIEW_COLUMNS = {
+    TAB_DASHBOARD: ["date"] + NUMERIC_COLUMNS,
+    TAB_CORRELATIONS: ["date"] + NUMERIC_COLUMNS,
+    TAB_RAW: EXPECTED_COLUMNS,
+    TAB_SETUP: ["date"] + NUMERIC_COLUMNS,
+}
+
+# st.tabs renders every tab and doesn't report which one is open, so navigate with a
+# horizontal radio: only the active view renders, and the fetch is projected to its columns.
+active_tab = st.radio(
+    "View", list(VIEW_COLUMNS), horizontal=True, key="active_tab", label_visibility="collapsed"
+)
+view_columns = VIEW_COLUMNS[active_tab]
 
 # Keep last-good df in session state so UI doesn't go blank on intermittent failures
 if "df" not in st.session_state:
     st.session_state.df = pd.DataFrame()
 
-# Pull fresh data automatically every refresh (cached at TTL)
+
+def _record_sync_success():
+    st.session_state.last_sync = datetime.now()
+    st.session_state.sync_error = None
+    st.session_state.synced_dirty_mtime = dirty_mtime
+
+
+def _window_caption(df: pd.DataFrame) -> str:
+    """Which rows the stats/table on screen cover (the session window may drop older rows)."""
+    total = max(st.session_state.get("last_row", 0) - 1, 0)
+    first, last = df["date"].min(), df["date"].max()
+    span = f" ({first:%Y-%m-%d} – {last:%Y-%m-%d})" if pd.notna(first) else ""
+    if total > len(df):
+        return f"the newest {len(df)} of {total} sheet rows{span}"
+    return f"all {len(df)} rows{span}"
+
+
+def _record_sync_error(e: Exception):
+    # Keep previous df if a refresh fails. Full traceback goes to the server log only;
+    # the page just gets the short repr.
+    logger.exception("Sheets refresh failed")
+    st.session_state.sync_error = e
+    st.warning(f"Auto-refresh failed (showing last loaded data): {repr(e)}")
+
+
+# First load blocks; after that each tick fetches in the background while the page renders
+# from the last-good df, and reruns once if the fetch brought new data.
+# In push mode, ticks where the dirty flag hasn't moved skip the fetch entirely (until the
+# fallback is due), and the ticks that do fetch re-read the whole sheet.
+last_sync = st.session_state.get("last_sync")
+push_fallback_due = (
+    last_sync is None or (datetime.now() - last_sync).total_seconds() >= PUSH_FALLBACK_SECONDS
+)
+sheet_unchanged = (
+    dirty_mtime is not None
+    and st.session_state.get("synced_dirty_mtime") == dirty_mtime
+    and not push_fallback_due
+    and not projection_widens(view_columns)
+)
+# The rerun right after an applied update only re-renders; it isn't a new refresh tick.
+rerun_after_update = st.session_state.pop("rerun_after_update", False)
+pending_refresh = None
 try:
-    st.session_state.df = load_data_cached()
+    if "last_row" not in st.session_state:
+        st.session_state.df = refresh_data(view_columns)
+        _record_sync_success()
+    elif not (sheet_unchanged or rerun_after_update):
+        pending_refresh = start_background_refresh(view_columns, full=dirty_mtime is not None)
 except Exception as e:
-    # Keep previous df if a refresh fails
-    st.warning(f"Auto-refresh failed (showing last loaded data): {repr(e)}")
+    _record_sync_error(e)
 
 df = st.session_state.df
 
 
-with tab4:
+if active_tab == TAB_SETUP:
     st.subheader("🔌 Connection Status")
-    try:
-        ws = get_worksheet()
-        st.success(f"✅ Connected! Worksheet: {ws.title}")
-    except Exception as e:
-        st.error(f"❌ Connection failed: {repr(e)}")
+    # Reuse the outcome of this rerun's batchGet instead of probing the sheet again
+    if st.session_state.get("sync_error") is not None:
+        st.error(f"❌ Connection failed: {repr(st.session_state.sync_error)}")
+    else:
+        # Sheet rows come from the incremental-read cursor (minus the header row), not len(df):
+        # the session only keeps the newest SESSION_MAX_ROWS of them
+        row_count = max(st.session_state.get("last_row", 0) - 1, 0)
+        # No last_sync yet if the first load was interrupted (rerun / stop) before finishing
+        last_sync = st.session_state.get("last_sync")
+        synced = f"last sync {last_sync:%H:%M:%S}" if last_sync else "not synced yet"
+        st.success(f"✅ Connected! Worksheet: {WORKSHEET_NAME} ({synced}, {row_count} rows)")
 
     st.divider()
     st.write("Secret file exists:")
     st.write(f"- {SECRET_FILE_PATH}: **{os.path.exists(SECRET_FILE_PATH)}**")
 
 
-with tab1:
+if active_tab == TAB_DASHBOARD:
     st.subheader("📊 Dashboard")
 
     if df is None or df.empty:
         st.info("No data yet (or sheet empty). Add rows in Google Sheets and this will update automatically.")
     else:
-        col1, col2, col3, col4 = st.columns(4)
-        col1.metric("Avg AHI", f"{df['ahi'].mean():.1f}" if df["ahi"].notna().any() else "—")
-        col2.metric("Avg Leak", f"{df['leak'].mean():.1f}" if df["leak"].notna().any() else "—")
-        col3.metric("Avg Coherence", f"{df['coherence'].mean():.1f}" if df["coherence"].notna().any() else "—")
-        col4.metric("Avg Energy", f"{df['energy'].mean():.1f}" if df["energy"].notna().any() else "—")
+        st.caption(f"Averages, deltas and trends over {_window_caption(df)}.")
+        # One float32 block for all four metrics instead of 8 separate column scans
+        arr = st.session_state.nums
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN column -> nan, shown as "—"
+            means = np.nanmean(arr, axis=0)
+        valid = ~np.isnan(arr).all(axis=0)
+        # Latest entry vs. the average (rows are sorted ascending with undated rows first, so
+        # that's the last row unless nothing is dated); NaN where either side is missing,
+        # which gets no delta
+        latest = arr[-1] if pd.notna(df["date"].iloc[-1]) else np.full(arr.shape[1], np.nan)
+        deltas = latest - means
+
+        labels = ["Avg AHI", "Avg Leak", "Avg Coherence", "Avg Energy"]
+        for i, col in enumerate(st.columns(4)):
+            col.metric(
+                labels[i],
+                f"{means[i]:.1f}" if valid[i] else "—",
+                delta=None if np.isnan(deltas[i]) else f"{deltas[i]:+.1f}",
+                # Lower AHI / leak is better
+                delta_color="inverse" if i < 2 else "normal",
+            )
 
         st.divider()
 
-        df_sorted = df.sort_values("date")
-        if df_sorted["date"].notna().any():
-            if df_sorted["ahi"].notna().any():
-                st.plotly_chart(
-                    px.line(df_sorted, x="date", y="ahi", title="AHI Trend", markers=True),
-                    use_container_width=True
-                )
-            if df_sorted["energy"].notna().any():
-                st.plotly_chart(
-                    px.line(df_sorted, x="date", y="energy", title="Energy Trend", markers=True),
-                    use_container_width=True
-                )
-
-
-with tab2:
+        # df is already sorted ascending by date at load.
+        # st.line_chart (Vega-Lite) takes the frame as Arrow; no server-side plotly figure JSON.
+        # Both trends go into one chart element (one Arrow payload / one render pass);
+        # metrics with no values yet are left out, reusing the `valid` mask from above.
+        trend_cols = [c for c, ok in zip(NUMERIC_COLUMNS, valid) if ok and c in ("ahi", "energy")]
+        if df["date"].notna().any() and trend_cols:
+            st.markdown("**AHI & Energy Trend**")
+            st.line_chart(df.set_index("date")[trend_cols])
+
+
+if active_tab == TAB_CORRELATIONS:
     st.subheader("🔍 Correlations")
-    corr = calculate_correlations(df)
+    corr = calculate_correlations(df, st.session_state.get("corr_state"))
     if corr is None:
         st.info("Need at least ~7 rows loaded to compute correlations.")
     else:
-        fig = go.Figure(
-            data=go.Heatmap(
-                z=corr.values,
-                x=corr.columns,
-                y=corr.columns,
-                zmid=0,
-            )
+        st.caption(f"Computed over {_window_caption(df)}.")
+        c32 = corr.to_numpy(dtype=np.float32)
+        img = correlation_image(c32.tobytes(), len(corr))
+        img_col, table_col = st.columns([2, 1])
+        img_col.image(img)
+        img_col.caption(
+            f"Rows/columns: {', '.join(corr.columns)} · red = negative, white = 0, blue = positive"
         )
-        st.plotly_chart(fig, use_container_width=True)
+        # Per-cell value labels only while the matrix is small enough to read them
+        if len(corr) <= CORR_LABEL_MAX_SIZE:
+            labels = pd.DataFrame(np.char.mod("%.2f", c32), index=corr.index, columns=corr.columns)
+            table_col.dataframe(labels, use_container_width=True)
 
 
-with tab3:
+if active_tab == TAB_RAW:
     st.subheader("🧾 Raw Table (auto-updating)")
     if df is None or df.empty:
         st.info("No rows yet.")
     else:
-        display_df = df.copy()
-        display_df["date"] = display_df["date"].dt.strftime("%Y-%m-%d")
-        st.dataframe(display_df, hide_index=True, use_container_width=True)
+        st.caption(f"Showing {_window_caption(df)}.")
+        st.dataframe(
+            df.iloc[::-1][["date_str"] + EXPECTED_COLUMNS[1:]],
+            hide_index=True,
+            use_container_width=True,
+            column_config={"date_str": "date"},
+        )
+
+
+if pending_refresh is not None:
+    try:
+        new_df, changed = apply_updates(pending_refresh.result())
+        st.session_state.df = new_df
+        _record_sync_success()
+    except Exception as e:
+        _record_sync_error(e)
+    else:
+        if changed:
+            st.session_state.rerun_after_update = True
+            st.rerun()
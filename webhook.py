@@ -0,0 +1,83 @@
+"""Tiny "sheet was edited" webhook for push-mode refresh.
+
+Run next to the Streamlit app (same machine / container, so both see /tmp). An installable
+Google Apps Script "On edit" trigger POSTs here; every POST touches DIRTY_FLAG_PATH, and
+app.py only re-reads Google Sheets after the flag's mtime changes.
+
+    WEBHOOK_TOKEN=... WEBHOOK_CERTFILE=cert.pem WEBHOOK_KEYFILE=key.pem python webhook.py
+
+With a certificate it serves HTTPS on 0.0.0.0:$WEBHOOK_PORT (default 8502). Without one it
+serves plain HTTP on 127.0.0.1 only, for a TLS-terminating reverse proxy on the same host
+(override the bind address with WEBHOOK_HOST).
+
+WEBHOOK_TOKEN is required: requests must send it in the X-Webhook-Token header.
+"""
+import hmac
+import os
+import signal
+import ssl
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+DIRTY_FLAG_PATH = "/tmp/dirty.flag"  # keep in sync with app.py
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8502"))
+WEBHOOK_TOKEN = os.environ.get("WEBHOOK_TOKEN", "")
+WEBHOOK_CERTFILE = os.environ.get("WEBHOOK_CERTFILE", "")
+WEBHOOK_KEYFILE = os.environ.get("WEBHOOK_KEYFILE", "")
+TOKEN_HEADER = "X-Webhook-Token"
+
+
+class DirtyFlagHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        # Header rather than ?token=: query strings end up in proxy and access logs
+        token = self.headers.get(TOKEN_HEADER, "")
+        if not hmac.compare_digest(token.encode(), WEBHOOK_TOKEN.encode()):
+            self.send_response(403)
+            self.end_headers()
+            return
+
+        Path(DIRTY_FLAG_PATH).touch()
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # Keep stderr quiet; one line per edit isn't useful
+        pass
+
+
+def make_server() -> ThreadingHTTPServer:
+    if WEBHOOK_CERTFILE:
+        host = os.environ.get("WEBHOOK_HOST", "0.0.0.0")
+        server = ThreadingHTTPServer((host, WEBHOOK_PORT), DirtyFlagHandler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(WEBHOOK_CERTFILE, WEBHOOK_KEYFILE or None)
+        # Handshake lazily in the request thread, so a client stalling mid-handshake doesn't
+        # block accept() for everyone else
+        server.socket = context.wrap_socket(
+            server.socket, server_side=True, do_handshake_on_connect=False
+        )
+        return server
+
+    # No TLS here: only a local proxy (which terminates TLS) should be able to reach us
+    host = os.environ.get("WEBHOOK_HOST", "127.0.0.1")
+    return ThreadingHTTPServer((host, WEBHOOK_PORT), DirtyFlagHandler)
+
+
+if __name__ == "__main__":
+    if not WEBHOOK_TOKEN:
+        sys.exit("WEBHOOK_TOKEN must be set (the endpoint is reachable by anyone who can hit the port)")
+
+    server = make_server()
+
+    # SIGTERM (container stop) should also run the cleanup below
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    # Create the flag up front so the app switches to push mode right away
+    Path(DIRTY_FLAG_PATH).touch()
+    try:
+        server.serve_forever()
+    finally:
+        # Without the webhook the flag would never move again; drop it so the app goes back
+        # to polling (app.py also re-reads periodically in case this never runs)
+        Path(DIRTY_FLAG_PATH).unlink(missing_ok=True)